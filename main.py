@@ -1,19 +1,44 @@
+import asyncio
+import math
+import os
+import pathlib
+import sys
 from datetime import datetime, time, timedelta
 from enum import Enum
-from typing import Union
+from functools import lru_cache
+from typing import Annotated, Any, Callable, Coroutine
 from uuid import UUID
 
-from fastapi import Body, Cookie, FastAPI, Path, Query, Header
-from pydantic import BaseModel, Field, HttpUrl
+import msgspec
+import orjson
+from fastapi import (
+    Body,
+    FastAPI,
+    Path,
+    Query,
+    Header,
+    Request,
+    Response,
+)
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, Field, HttpUrl, validator
 
 
 class Item(BaseModel):
     name: str
-    description: Union[str, None] = Field(
+    description: str | None = Field(
         default=None, title="The description of the item", max_length=300
     )
     price: float = Field(gt=0, description="The price must be greater than zero")
-    tax: Union[float, None] = None
+    tax: float | None = None
+
+    @validator("price", "tax")
+    def check_finite(cls, v):
+        # orjson writes inf/nan as null, which would break the response schema.
+        if v is not None and not math.isfinite(v):
+            raise ValueError("value is not a finite number")
+        return v
 
     class Config:
         schema_extra = {
@@ -26,7 +51,110 @@ class Item(BaseModel):
         }
 
 
-app = FastAPI()
+class ItemStruct(msgspec.Struct, kw_only=True):
+    # Mirrors Item's fields and constraints, including the finite check on
+    # price/tax: ItemRoute skips Item's validators, so update both together.
+    name: str
+    description: Annotated[str, msgspec.Meta(max_length=300)] | None = None
+    price: Annotated[float, msgspec.Meta(gt=0, le=sys.float_info.max)]
+    tax: (
+        Annotated[float, msgspec.Meta(ge=-sys.float_info.max, le=sys.float_info.max)]
+        | None
+    ) = None
+
+
+def _is_json_request(request: Request) -> bool:
+    # Same rule FastAPI uses for bodies: no content type, JSON, or a +json type.
+    content_type = request.headers.get("content-type")
+    if content_type is None:
+        return True
+    media_type = content_type.partition(";")[0].strip().lower()
+    return media_type == "application/json" or (
+        media_type.startswith("application/") and media_type.endswith("+json")
+    )
+
+
+class FastBodyRoute(APIRoute):
+    """Route that decodes its JSON body without FastAPI's body handling.
+
+    Subclasses implement ``decode_body``, returning the endpoint's body
+    argument or raising ``ValueError`` for input they do not handle. Those
+    requests, and non-JSON bodies, go through FastAPI's regular handler, so
+    coercion, validation errors and the ``HTTPValidationError`` shape are
+    unchanged. The fast path calls the endpoint directly, so it must be an
+    ``async def`` taking only the body parameter and returning a Response.
+    """
+
+    def decode_body(self, body: bytes) -> Any:
+        raise NotImplementedError
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        dependant = self.dependant
+        assert (
+            len(dependant.body_params) == 1
+            and not getattr(dependant.body_params[0].field_info, "embed", False)
+            and not (
+                dependant.dependencies
+                or dependant.path_params
+                or dependant.query_params
+                or dependant.header_params
+                or dependant.cookie_params
+                or dependant.request_param_name
+                or dependant.response_param_name
+                or dependant.background_tasks_param_name
+            )
+            and asyncio.iscoroutinefunction(self.endpoint)
+        ), f"{type(self).__name__} needs an async endpoint with only a body parameter"
+        fallback_handler = super().get_route_handler()
+        endpoint = self.endpoint
+        body_name = dependant.body_params[0].name
+
+        async def route_handler(request: Request) -> Response:
+            if _is_json_request(request):
+                try:
+                    value = self.decode_body(await request.body())
+                except ValueError:
+                    pass
+                else:
+                    return await endpoint(**{body_name: value})
+            return await fallback_handler(request)
+
+        return route_handler
+
+
+class ItemRoute(FastBodyRoute):
+    def decode_body(self, body: bytes) -> Item:
+        item = msgspec.json.decode(body, type=ItemStruct)
+        return Item.construct(**msgspec.structs.asdict(item))
+
+
+class IndexWeightsRoute(FastBodyRoute):
+    def decode_body(self, body: bytes) -> dict[int, float]:
+        raw = orjson.loads(body)
+        if not isinstance(raw, dict):
+            raise ValueError("body is not a JSON object")
+        # Only plain digit keys and finite numbers are converted here; anything
+        # pydantic would coerce differently or reject takes the fallback.
+        weights = {}
+        for key, value in raw.items():
+            if not (key.isascii() and key.isdigit()) or type(value) not in (int, float):
+                raise ValueError("weight needs pydantic validation")
+            try:
+                weight = float(value)
+            except OverflowError:
+                raise ValueError("weight is out of range") from None
+            if not math.isfinite(weight):
+                raise ValueError("weight is not finite")
+            weights[int(key)] = weight
+        return weights
+
+
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# Idempotent GET routes let downstream HTTP caches reuse their responses;
+# per-user payloads may only be kept by the client's own cache.
+CACHE_HEADERS = {"Cache-Control": "public, max-age=60"}
+PRIVATE_CACHE_HEADERS = {"Cache-Control": "private, max-age=60"}
 
 
 class ModelName(str, Enum):
@@ -40,7 +168,6 @@ class User(BaseModel):
     full_name: str | None = None
 
 
-@app.post("/items")
 async def create_item(item: Item):
 
     """This is an example of a module level function.
@@ -91,7 +218,16 @@ async def create_item(item: Item):
         ValueError: If `param2` is equal to `param1`.
 
     """
-    return item
+    return ORJSONResponse(item.dict())
+
+
+app.router.add_api_route(
+    "/items",
+    create_item,
+    methods=["POST"],
+    response_model=None,
+    route_class_override=ItemRoute,
+)
 
 
 # @app.put("/items/{item_id}")
@@ -102,53 +238,66 @@ async def create_item(item: Item):
 #     return result
 
 
-@app.get("/")
+_ROOT_BODY = orjson.dumps({"message": "Hello world"})
+_USER_ME_BODY = orjson.dumps({"user_id": "the current user"})
+_LONG_DESC = "This is an amazing item that has a long description"
+
+ITEM_ID_PATH = Path(title="The ID of the item to get", default=..., gt=0, le=1000)
+UPDATE_ITEM_ID_PATH = Path(title="The ID of the item to get", ge=0, le=1000)
+SIZE_QUERY = Query(ge=-10, lt=10.5, default=None)
+USER_ITEM_Q_QUERY = Query(default=None, min_length=3, max_length=50)
+
+
+@app.get("/", response_model=None)
 async def root():
-    return {"message": "Hello world"}
+    return Response(_ROOT_BODY, media_type="application/json", headers=CACHE_HEADERS)
+
+
+@app.get("/users/me", response_model=None)
+async def read_user_me():
+    return Response(
+        _USER_ME_BODY, media_type="application/json", headers=PRIVATE_CACHE_HEADERS
+    )
 
 
-@app.get("/items/{item_id}")
+@app.get("/items/{item_id}", response_model=None)
 async def read_item(
-    item_id: int = Path(title="The ID of the item to get", default=..., gt=0, le=1000),
-    q: Union[str, None] = None,
-    size: Union[float, None] = Query(ge=-10, lt=10.5, default=None),
+    item_id: int = ITEM_ID_PATH,
+    q: str | None = None,
+    size: float | None = SIZE_QUERY,
     short: bool = False,
 ):
-    item = {"item_id": item_id}
-    if q:
-        item.update({"q": q})
-    if not short:
-        item.update(
-            {"description": "This is an amazing item that has a long description"}
-        )
-    return item
+    item = {
+        "item_id": item_id,
+        **({"q": q} if q else {}),
+        **({} if short else {"description": _LONG_DESC}),
+    }
+    return ORJSONResponse(item, headers=CACHE_HEADERS if short else None)
 
 
-@app.get("/shots/{shot_id}")
+@app.get("/shots/{shot_id}", response_model=None)
 async def read_user_item(shot_id: str, needy: str):
     item = {"shot_id": shot_id, "needy": needy}
-    return item
+    return ORJSONResponse(item)
 
 
-@app.put("/items/{item_id}")
+@app.put("/items/{item_id}", response_model=None)
 async def update_item(
     *,
-    item_id: int = Path(title="The ID of the item to get", ge=0, le=1000),
+    item_id: int = UPDATE_ITEM_ID_PATH,
     q: str | None = None,
     item: Item | None = None,
     user: User | None = None,
-    importance: int = Body(default=...)
+    importance: int = Body(default=...),
 ):
-    results = {"item_id": item_id}
-    if q:
-        results.update({"q": q})
-    if item:
-        results.update({"item": item})
-    if user:
-        results.update({"user": user})
-    if importance:
-        results.update({"importance": importance})
-    return results
+    results = {
+        "item_id": item_id,
+        **({"q": q} if q else {}),
+        **({"item": item.dict()} if item else {}),
+        **({"user": user.dict()} if user else {}),
+        **({"importance": importance} if importance else {}),
+    }
+    return ORJSONResponse(results)
 
 
 class Shot(BaseModel):
@@ -166,48 +315,22 @@ class Shot(BaseModel):
         }
 
 
-@app.post("/shots")
-async def create_shots(
-    shot: Shot = Body(
-        examples={
-            "normal": {
-                "summary": "a normal example",
-                "description": "a **normal** item works correctly",
-                "value": {
-                    "name": "A normal example",
-                    "thumbnail_url": "https://ricepotato.bitbucket.io/normal/thumbnail",
-                    "image_url": "https://ricepotato.bitbucket.io/normal/image",
-                },
-            },
-            "converted": {
-                "summary": "a converted example",
-                "description": "a **converted** item works correctly",
-                "value": {
-                    "name": "A converted example",
-                    "thumbnail_url": "https://ricepotato.bitbucket.io/converted/thumbnail",
-                    "image_url": "https://ricepotato.bitbucket.io/converted/image",
-                },
-            },
-            "invalid": {
-                "summary": "a invalid example",
-                "description": "a **invalid** item works correctly",
-                "value": {
-                    "name": "A invalid example",
-                    "thumbnail_url": "https://ricepotato.bitbucket.io/invalid/thumbnail",
-                    "image_url": "https://ricepotato.bitbucket.io/invalid/image",
-                },
-            },
-        }
-    )
-):
-    return shot
+SHOT_EXAMPLES = orjson.loads(
+    pathlib.Path(__file__).with_name("shot_examples.json").read_bytes()
+)
+SHOT_BODY = Body(examples=SHOT_EXAMPLES)
+
+
+@app.post("/shots", response_model=None)
+async def create_shots(shot: Shot = SHOT_BODY):
+    return ORJSONResponse(shot.dict())
 
 
 class ShotV2(BaseModel):
     item_id: UUID
 
 
-@app.put("/shots/{shot_id}")
+@app.put("/shots/{shot_id}", response_model=None)
 async def update_shots(
     shot_id: UUID = Path(example="f902674b-0526-4a35-884a-b2eb809bd7ab"),
     start_datetime: datetime | None = Body(default=None),
@@ -217,76 +340,117 @@ async def update_shots(
 ):
     start_process = start_datetime + process_after
     duration = end_datetime - start_process
-    return {
-        "shot_id": shot_id,
-        "start_datetime": start_datetime,
-        "end_datetime": end_datetime,
-        "repeat_at": repeat_at,
-        "process_after": process_after,
-        "start_process": start_process,
-        "duration": duration,
+    result = {
+        "shot_id": str(shot_id),
+        "start_datetime": start_datetime.isoformat(),
+        "end_datetime": end_datetime.isoformat(),
+        "repeat_at": repeat_at.isoformat() if repeat_at is not None else None,
+        "process_after": process_after.total_seconds(),
+        "start_process": start_process.isoformat(),
+        "duration": duration.total_seconds(),
     }
+    return ORJSONResponse(result)
 
 
 fake_items_db = [{"item_name": "Foo"}, {"item_name": "Bar"}, {"item_name": "Baz"}]
 
 
-@app.get("/items")
-async def read_item_with_params(skip: int = 0, limit: int = 10):
-    return fake_items_db[skip : skip + limit]
+@lru_cache(maxsize=256)
+def _slice_items(skip: int, limit: int) -> tuple:
+    return tuple(fake_items_db[skip : skip + limit])
 
 
-@app.get("/users/me")
-async def read_user_me():
-    return {"user_id": "the current user"}
+@app.get("/items", response_model=None)
+async def read_item_with_params(skip: int = 0, limit: int = 10):
+    return ORJSONResponse(_slice_items(skip, limit))
 
 
-@app.get("/users/{user_id}/items/{item_id}")
+@app.get("/users/{user_id}/items/{item_id}", response_model=None)
 async def read_user_item2(
     user_id: int,
     item_id: str,
-    q: Union[str, None] = Query(default=None, min_length=3, max_length=50),
+    q: str | None = USER_ITEM_Q_QUERY,
     short: bool = False,
 ):
-    item = {"item_id": item_id, "owner_id": user_id}
-    if q:
-        item.update({"q": q})
-    if not short:
-        item.update(
-            {"description": "This is an amazing item that has a long description"}
-        )
-    return item
+    item = {
+        "item_id": item_id,
+        "owner_id": user_id,
+        **({"q": q} if q else {}),
+        **({} if short else {"description": _LONG_DESC}),
+    }
+    return ORJSONResponse(item)
 
 
-@app.get("/users/{user_id}")
+@lru_cache(maxsize=1024)
+def _user_body(user_id: str) -> bytes:
+    return orjson.dumps({"user_id": user_id})
+
+
+@app.get("/users/{user_id}", response_model=None)
 async def read_user(user_id: str):
-    return {"user_id": user_id}
+    return Response(
+        _user_body(user_id),
+        media_type="application/json",
+        headers=PRIVATE_CACHE_HEADERS,
+    )
 
 
-@app.get("/models/{model_name}")
-async def get_model(model_name: ModelName):
-    if model_name == ModelName.alexnet:
-        return {"model_name": model_name, "message": "Deep Learning FTW!"}
+_MODEL_MSG = {
+    ModelName.alexnet: "Deep Learning FTW!",
+    ModelName.lenet: "LeCNN all the images",
+}
+
+
+_MODEL_BODY = {
+    model_name: orjson.dumps(
+        {
+            "model_name": model_name,
+            "message": _MODEL_MSG.get(model_name, "Have some residuals"),
+        }
+    )
+    for model_name in ModelName
+}
 
-    if model_name.value == "lenet":
-        return {"model_name": model_name, "message": "LeCNN all the images"}
 
-    return {"model_name": model_name, "message": "Have some residuals"}
+@app.get("/models/{model_name}", response_model=None)
+async def get_model(model_name: ModelName):
+    return Response(
+        _MODEL_BODY[model_name], media_type="application/json", headers=CACHE_HEADERS
+    )
 
 
-@app.get("/files/{file_path:path}")
+@app.get("/files/{file_path:path}", response_model=None)
 async def read_file(file_path: str):
-    return {"file_path": file_path}
+    return ORJSONResponse({"file_path": file_path}, headers=CACHE_HEADERS)
 
 
-@app.post("/index-weights/")
 async def create_index_weights(weights: dict[int, float]):
-    return weights
+    return JSONResponse(weights)
+
 
+app.router.add_api_route(
+    "/index-weights/",
+    create_index_weights,
+    methods=["POST"],
+    response_class=JSONResponse,
+    route_class_override=IndexWeightsRoute,
+)
 
-@app.get("/header")
+
+@app.get("/header", response_model=None)
 async def get_header(
-    user_agent: Union[str, None] = Header(default=None),
-    api_key: Union[str, None] = Header(default=None),
+    user_agent: str | None = Header(default=None),
+    api_key: str | None = Header(default=None),
 ):
-    return {"User-Agent": user_agent, "api-key": api_key}
+    return ORJSONResponse({"User-Agent": user_agent, "api-key": api_key})
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "main:app",
+        loop="uvloop",
+        http="httptools",
+        workers=os.cpu_count(),
+    )